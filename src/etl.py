@@ -1,10 +1,23 @@
 # src/etl.py
 
 import os
+import atexit
+import contextlib
+import csv
+import io
+import itertools
+import mmap
+import re
+import functools
 import socket
 import logging
-from datetime import datetime
-from pymongo import MongoClient
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from bson import ObjectId
+from pymongo import IndexModel, MongoClient, WriteConcern
+from pymongo.errors import BulkWriteError
 
 # Configure logging
 logging.basicConfig(
@@ -17,172 +30,478 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
-def read_data(file_path):
+# Column names of the pipe-delimited input file, in file order
+FIELDS = (
+    'FirstName', 'LastName', 'Company', 'BirthDate', 'Salary', 'Address',
+    'Suburb', 'State', 'Post', 'Phone', 'Mobile', 'Email'
+)
+
+# BirthDate values are ddmmyyyy in ASCII digits, optionally without leading zeros on the day
+BIRTH_DATE_PATTERN = re.compile(r'[0-9]{6,8}')
+
+# Days per month, indexed by month number; 0 and 13 catch out-of-range months
+DAYS_IN_MONTH = np.array([0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31, 0], dtype='int8')
+
+# Number of documents sent to MongoDB per insert_many call
+BATCH_SIZE = 500
+
+# Number of insert_many calls issued concurrently; the pool leaves headroom
+# for monitoring connections
+MAX_WORKERS = 32
+MAX_POOL_SIZE = 64
+
+# Maximum number of skipped lines or records logged individually; the rest
+# are only counted
+LOG_SAMPLE_SIZE = 5
+
+# Shared MongoClient, created lazily by _get_client
+_client = None
+_client_lock = threading.Lock()
+
+# Number of bytes of the input file scanned for line boundaries at a time
+READ_BLOCK_SIZE = 64 << 20
+
+# Number of input lines parsed, transformed and loaded together
+CHUNK_SIZE = 50_000
+
+def _line_chunks(file_path, chunksize):
     """
-    Reads data from a pipe-delimited file and returns a list of records.
+    Splits a file into chunks of at most `chunksize` lines.
+
+    The file is memory-mapped, letting the OS handle readahead, and scanned
+    READ_BLOCK_SIZE bytes at a time; line boundaries are located with NumPy
+    rather than a per-line Python loop. Blocks and chunks are views into the
+    map, so no file data is copied here.
 
     Args:
         file_path (str): The path to the data file.
+        chunksize (int): The maximum number of lines per chunk.
 
-    Returns:
-        List[Dict[str, Any]]: A list of records as dictionaries.
+    Yields:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: A read-only uint8 view of the
+        chunk's bytes and the start and end offset of each line within it, the
+        end excluding the newline.
+    """
+    with open(file_path, 'rb') as file:
+        # An empty file cannot be mapped, and has no lines anyway
+        if os.fstat(file.fileno()).st_size == 0:
+            return
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    # The map is not closed explicitly: it is released once the last view of it,
+    # possibly a chunk still held by the caller, is gone
+    content = np.frombuffer(mapped, dtype=np.uint8)
+
+    position = 0
+    while position < len(content):
+        block_end = mapped.find(b'\n', position + READ_BLOCK_SIZE) + 1 or len(content)
+        block = content[position:block_end]
+        ends = np.flatnonzero(block == ord('\n'))
+        if len(ends) == 0 or ends[-1] != len(block) - 1:
+            # The last line of the file has no trailing newline
+            ends = np.append(ends, len(block))
+        starts = np.concatenate(([0], ends[:-1] + 1))
+
+        next_position = block_end
+        for first in range(0, len(starts), chunksize):
+            last = min(first + chunksize, len(starts))
+            if last - first < chunksize and first > 0 and block_end < len(content):
+                # Carry a partial chunk over to the next block
+                next_position = position + int(starts[first])
+                break
+            offset = starts[first]
+            yield block[offset:ends[last - 1] + 1], starts[first:last] - offset, ends[first:last] - offset
+        position = next_position
+
+def read_data(file_path, chunksize=CHUNK_SIZE):
+    """
+    Reads data from a pipe-delimited file, yielding DataFrames of raw records.
+
+    The file is processed `chunksize` lines at a time. Memory use is bounded by
+    the line-boundary scan over one READ_BLOCK_SIZE block of the memory-mapped
+    file plus one copy of the current chunk for the parser, rather than by the
+    input file.
+
+    Lines that don't have exactly 12 fields are found by counting their
+    separators and cut out before the remaining lines are parsed by pandas' C
+    parser. Field values are left as-is; whitespace is stripped by
+    transform_data.
+
+    Args:
+        file_path (str): The path to the data file.
+        chunksize (int): The maximum number of lines parsed per chunk.
+
+    Yields:
+        pd.DataFrame: One row per record, with a string column per field.
     """
-    data = []
+    record_count = 0
+    malformed_count = 0
     try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            for line in file:
-                line = line.strip()
-                fields = line.split('|')
-
-                # Skip lines that don't have exactly 12 fields
-                if len(fields) != 12:
-                    logger.warning(f"Skipping line due to incorrect number of fields: {line}")
-                    continue
-
-                record = {
-                    'FirstName': fields[0].strip(),
-                    'LastName': fields[1].strip(),
-                    'Company': fields[2].strip().strip('"'),
-                    'BirthDate': fields[3].strip(),
-                    'Salary': fields[4].strip(),
-                    'Address': fields[5].strip(),
-                    'Suburb': fields[6].strip(),
-                    'State': fields[7].strip(),
-                    'Post': fields[8].strip(),
-                    'Phone': fields[9].strip(),
-                    'Mobile': fields[10].strip(),
-                    'Email': fields[11].strip()
-                }
-                data.append(record)
-        logger.info(f"Extracted {len(data)} records from {file_path}.")
-        return data
+        for chunk, starts, ends in _line_chunks(file_path, chunksize):
+            separators = np.add.reduceat(chunk == ord('|'), starts, dtype=np.int64)
+
+            # Skip lines that don't have exactly 12 fields, logging only a few samples
+            malformed = separators != len(FIELDS) - 1
+            malformed_lines = np.flatnonzero(malformed)
+            for line in malformed_lines[:max(0, LOG_SAMPLE_SIZE - malformed_count)]:
+                sample = chunk[starts[line]:ends[line]].tobytes().decode('utf-8', errors='replace').rstrip('\r')
+                logger.warning("Skipping malformed line (sample): %r", sample)
+            malformed_count += len(malformed_lines)
+            if len(malformed_lines):
+                line_lengths = np.diff(np.append(starts, len(chunk)))
+                chunk = chunk[~np.repeat(malformed, line_lengths)]
+            if len(chunk) == 0:
+                continue
+
+            data = pd.read_csv(
+                # The parser reads from a copy of the chunk, the only copy of the file data
+                io.BytesIO(chunk.tobytes()),
+                sep='|',
+                header=None,
+                names=FIELDS,
+                # State has few distinct values, so it is stored as integer category codes
+                dtype={**dict.fromkeys(FIELDS, 'string'), 'State': 'category'},
+                engine='c',
+                encoding='utf-8',
+                # QUOTE_NONE keeps quote characters in the data, matching a plain split on '|'
+                quoting=csv.QUOTE_NONE,
+                # Keep every value verbatim: empty fields stay '' and 'NA' stays 'NA'
+                na_filter=False
+            )
+
+            record_count += len(data)
+            yield data
+        logger.info("Extracted %d records from %s.", record_count, file_path)
+        logger.info("Skipped %d malformed lines.", malformed_count)
     except Exception as e:
-        logger.error(f"Failed to read data from {file_path}: {e}")
+        logger.error("Failed to read data from %s: %s", file_path, e)
         raise
 
-def transform_data(data):
+def _birth_date_salary_kernel(day, month, year, salary):
+    """
+    Validates birth dates and derives Age and SalaryBucket codes using only
+    NumPy array arithmetic, with no pandas or per-row Python overhead.
+
+    Args:
+        day (np.ndarray): Day of birth as int8.
+        month (np.ndarray): Month of birth as int8.
+        year (np.ndarray): Year of birth as int16.
+        salary (np.ndarray): Salary as float64.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: Whether each birth date exists,
+        the Age against the 2024-03-01 reference date as int16, and the
+        SalaryBucket code as int8 (0 = A, 1 = B, 2 = C).
+    """
+    # Reject impossible dates such as 31 February or month 13
+    leap_year = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    month_length = DAYS_IN_MONTH[np.clip(month, 0, 13)] + (leap_year & (month == 2))
+    valid_date = (year >= 1) & (day >= 1) & (day <= month_length)
+
+    birthday_after_reference = (month > 3) | ((month == 3) & (day > 1))
+    age = (2024 - year - birthday_after_reference).astype('int16')
+
+    # A below 50,000, B up to and including 100,000, C above
+    salary_bucket_codes = (salary >= 50000).astype('int8') + (salary > 100000).astype('int8')
+
+    return valid_date, age, salary_bucket_codes
+
+def _log_transform_summary(counts):
+    """
+    Logs the totals kept by transform_data.
+
+    Args:
+        counts (Dict[str, int]): The 'transformed' and 'skipped' record counts.
+    """
+    logger.info("Transformed %d records.", counts['transformed'])
+    logger.info("Skipped %d records due to invalid BirthDate or Salary.", counts['skipped'])
+
+def transform_data(data, counts=None):
     """
     Transforms raw data records into a structured format suitable for loading into MongoDB.
 
+    The transformation is vectorized: the records are loaded into a single
+    DataFrame and each field is processed column-wise rather than per row.
+
+    When the records arrive in chunks, the caller passes the same `counts` to
+    every call. The totals then accumulate there, the LOG_SAMPLE_SIZE budget
+    for skipped-record samples is shared across the calls, and logging the
+    summary with _log_transform_summary is left to the caller.
+
     Args:
-        data (List[Dict[str, Any]]): The raw data records.
+        data (Union[pd.DataFrame, List[Dict[str, Any]]]): The raw data records.
+        counts (Optional[Dict[str, int]]): Running 'transformed' and 'skipped'
+            record counts, updated in place. If omitted, the summary for this
+            call is logged here.
 
     Returns:
         List[Dict[str, Any]]: The transformed data records.
     """
-    transformed_data = []
-    skipped_records = 0
-    reference_date = datetime(2024, 3, 1)
+    log_summary = counts is None
+    if counts is None:
+        counts = {'transformed': 0, 'skipped': 0}
+    if len(data) == 0:
+        if log_summary:
+            _log_transform_summary(counts)
+        return []
 
-    for record in data:
-        try:
-            # Clean and combine names
-            first_name = record['FirstName'].strip()
-            last_name = record['LastName'].strip()
-            full_name = f"{first_name} {last_name}"
-
-            # Process BirthDate
-            birth_date_str_raw = record['BirthDate'].strip()
-            if not birth_date_str_raw or len(birth_date_str_raw) < 6:
-                logger.warning(f"Skipping record due to invalid BirthDate format: '{birth_date_str_raw}' for {full_name}")
-                skipped_records += 1
-                continue
+    format_salary = "${:,.2f}".format
+    df = pd.DataFrame(data).reset_index(drop=True)
 
-            birth_date_str = birth_date_str_raw.zfill(8)
-            birth_date = datetime.strptime(birth_date_str, '%d%m%Y')
-            birth_date_formatted = birth_date.strftime('%d/%m/%Y')
+    # Strip every field once; categorical columns only strip their categories
+    for field in FIELDS:
+        if isinstance(df[field].dtype, pd.CategoricalDtype):
+            df[field] = df[field].map(str.strip).astype('category')
+        else:
+            df[field] = df[field].str.strip()
+    df['Company'] = df['Company'].str.strip('"')
 
-            # Calculate Age
-            age = reference_date.year - birth_date.year - (
-                (reference_date.month, reference_date.day) < (birth_date.month, birth_date.day)
-            )
+    # Combine names
+    full_name = df['FirstName'] + ' ' + df['LastName']
 
-            # Format Salary
-            salary_float = float(record['Salary'])
-            salary_formatted = "${:,.2f}".format(salary_float)
-
-            # Determine SalaryBucket
-            if salary_float < 50000:
-                salary_bucket = 'A'
-            elif 50000 <= salary_float <= 100000:
-                salary_bucket = 'B'
-            else:
-                salary_bucket = 'C'
-
-            # Create nested Address
-            address = {
-                'Street': record['Address'],
-                'Suburb': record['Suburb'],
-                'State': record['State'],
-                'Post': record['Post']
-            }
-
-            # Build transformed record
-            transformed_record = {
-                'FullName': full_name,
-                'Company': record['Company'],
-                'BirthDate': birth_date_formatted,
-                'Age': age,
-                'Salary': salary_formatted,
-                'SalaryBucket': salary_bucket,
-                'Address': address,
-                'Phone': record['Phone'],
-                'Mobile': record['Mobile'],
-                'Email': record['Email']
-            }
-
-            transformed_data.append(transformed_record)
-        except ValueError as e:
-            logger.warning(f"Skipping record due to date parsing error: '{birth_date_str_raw}' for {full_name}. Error: {e}")
-            skipped_records += 1
-            continue
-        except Exception as e:
-            logger.error(f"Unexpected error while transforming record for {full_name}: {e}")
-            skipped_records += 1
-            continue
+    # Process BirthDate without materializing datetimes: well-formed values are
+    # zero-padded to ddmmyyyy and sliced into small integer day/month/year columns
+    well_formed = df['BirthDate'].str.fullmatch(BIRTH_DATE_PATTERN).astype(bool).to_numpy()
+    birth_date_str = df['BirthDate'].where(well_formed, '00000000').str.zfill(8)
+    day = birth_date_str.str[:2].astype('int8').to_numpy()
+    month = birth_date_str.str[2:4].astype('int8').to_numpy()
+    year = birth_date_str.str[4:8].astype('int16').to_numpy()
+
+    # Format Salary; non-numeric salaries become NaN
+    salary = pd.to_numeric(df['Salary'], errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+
+    valid_date, age, salary_bucket_codes = _birth_date_salary_kernel(day, month, year, salary)
+
+    valid = well_formed & valid_date & ~np.isnan(salary)
+    sample_budget = max(0, LOG_SAMPLE_SIZE - counts['skipped'])
+    samples = zip(full_name[~valid].head(sample_budget), df['BirthDate'][~valid].head(sample_budget))
+    for name, raw in samples:
+        logger.warning("Skipping record due to invalid BirthDate or Salary (sample): %r for %s", raw, name)
 
-    logger.info(f"Transformed {len(transformed_data)} records.")
-    logger.info(f"Skipped {skipped_records} records due to invalid or missing BirthDate.")
+    df = df[valid]
+    full_name = full_name[valid]
+    birth_date_str = birth_date_str[valid]
+    age = age[valid]
+    salary = salary[valid]
+    salary_bucket = pd.Categorical.from_codes(salary_bucket_codes[valid], categories=['A', 'B', 'C'])
+
+    # Assemble the documents, including the nested Address, straight from the
+    # column lists rather than through DataFrame.to_dict; _id is assigned here
+    # so the driver does not have to add it to every document on insert
+    transformed_data = [
+        {
+            '_id': ObjectId(),
+            'FullName': record[0],
+            'Company': record[1],
+            'BirthDate': record[2],
+            'Age': record[3],
+            'Salary': record[4],
+            'SalaryBucket': record[5],
+            'Address': {
+                'Street': record[6],
+                'Suburb': record[7],
+                'State': record[8],
+                'Post': record[9]
+            },
+            'Phone': record[10],
+            'Mobile': record[11],
+            'Email': record[12]
+        }
+        for record in zip(
+            full_name.tolist(),
+            df['Company'].tolist(),
+            birth_date_str.str[:2].str.cat(
+                [birth_date_str.str[2:4], birth_date_str.str[4:]], sep='/'
+            ).tolist(),
+            age.tolist(),
+            list(map(format_salary, salary.tolist())),
+            salary_bucket.tolist(),
+            df['Address'].tolist(),
+            df['Suburb'].tolist(),
+            df['State'].tolist(),
+            df['Post'].tolist(),
+            df['Phone'].tolist(),
+            df['Mobile'].tolist(),
+            df['Email'].tolist()
+        )
+    ]
+
+    counts['transformed'] += len(transformed_data)
+    counts['skipped'] += int((~valid).sum())
+    if log_summary:
+        _log_transform_summary(counts)
     return transformed_data
 
-def load_data(data):
+@functools.lru_cache(maxsize=None)
+def _mongo_host():
+    """
+    Determines the MongoDB host once per process.
+
+    The MONGO_HOST environment variable takes precedence; otherwise a single DNS
+    lookup decides between the Docker service name and localhost.
+
+    Returns:
+        str: The MongoDB host name.
+    """
+    mongo_host = os.environ.get('MONGO_HOST')
+    if mongo_host:
+        return mongo_host
+    try:
+        socket.gethostbyname('mongo')
+        return 'mongo'  # Inside Docker
+    except socket.gaierror:
+        return 'localhost'  # On Host Machine
+
+def _get_client():
+    """
+    Returns the process-wide MongoClient, creating it on first use.
+
+    MongoClient is thread-safe and pools its own connections, so one client is
+    shared by every load_data call and closed when the interpreter exits.
+
+    Returns:
+        MongoClient: The shared MongoDB client.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = MongoClient(
+                    f'mongodb://{_mongo_host()}:27017/',
+                    w=1,
+                    maxPoolSize=MAX_POOL_SIZE,
+                    compressors='zlib'
+                )
+                atexit.register(_client.close)
+    return _client
+
+def _insert_batch(collection, batch, bypass_document_validation):
+    """
+    Inserts one batch of records, returning the write error details if any
+    documents in the batch failed.
+
+    Args:
+        collection (Collection): The target MongoDB collection.
+        batch (List[Dict[str, Any]]): The records to insert.
+        bypass_document_validation (bool): Whether to skip schema validation;
+            MongoDB only allows this for acknowledged writes.
+
+    Returns:
+        Optional[Dict[str, Any]]: The BulkWriteError details, or None on success.
+    """
+    try:
+        collection.insert_many(
+            batch, ordered=False, bypass_document_validation=bypass_document_validation
+        )
+    except BulkWriteError as e:
+        return e.details
+    return None
+
+def load_data(data, fast_insert=True):
     """
     Loads transformed data into a MongoDB collection.
 
+    Records are inserted in unordered batches of BATCH_SIZE, with up to
+    MAX_WORKERS batches in flight at once so that network round trips overlap.
+    A failing document does not stop the rest of its batch from being written.
+
+    By default writes are unacknowledged (w=0): the input file remains the
+    source of truth, so throughput is favoured over server confirmation and
+    write errors are not reported. Pass fast_insert=False for acknowledged
+    (w=1) writes whose failures are logged.
+
     Args:
         data (List[Dict[str, Any]]): The transformed data records.
+        fast_insert (bool): Whether to use unacknowledged writes.
     """
     try:
-        # Determine the MongoDB host
-        try:
-            socket.gethostbyname('mongo')
-            mongo_host = 'mongo'  # Inside Docker
-        except socket.gaierror:
-            mongo_host = 'localhost'  # On Host Machine
-
-        client = MongoClient(f'mongodb://{mongo_host}:27017/')
+        client = _get_client()
         db = client['etl_database']
-        collection = db['employees']
-        collection.insert_many(data)
-        client.close()
+        collection = db.get_collection(
+            'employees', write_concern=WriteConcern(w=0 if fast_insert else 1)
+        )
+        insert_batch = functools.partial(
+            _insert_batch, collection, bypass_document_validation=not fast_insert
+        )
+        batches = [data[start:start + BATCH_SIZE] for start in range(0, len(data), BATCH_SIZE)]
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            errors = [details for details in executor.map(insert_batch, batches) if details is not None]
+        for details in errors:
+            logger.warning("Batch partially failed to load: %s", details)
         logger.info("Data loaded into MongoDB successfully.")
     except Exception as e:
-        logger.error(f"An error occurred while loading data into MongoDB: {e}")
+        logger.error("An error occurred while loading data into MongoDB: %s", e)
         raise
 
+@contextlib.contextmanager
+def suspended_indexes():
+    """
+    Drops the non-unique secondary indexes of the employees collection for the
+    duration of a bulk load and rebuilds them afterwards.
+
+    Building each index once over the loaded data is much cheaper than
+    maintaining it on every insert. Unique indexes are constraints rather than
+    lookup aids, so they are left in place. The dropped indexes are recreated
+    with their original names and options when the block exits, even if the
+    load fails. If a rebuild fails, the index specifications are logged and the
+    error is raised, chained to the load error if there was one. Collections
+    without such indexes, such as on a first run, are left untouched.
+    """
+    collection = _get_client()['etl_database']['employees']
+    indexes = [
+        IndexModel(
+            info['key'],
+            name=name,
+            **{option: value for option, value in info.items() if option not in ('key', 'v', 'ns')}
+        )
+        for name, info in collection.index_information().items()
+        if name != '_id_' and not info.get('unique')
+    ]
+    if not indexes:
+        yield
+        return
+
+    for index in indexes:
+        collection.drop_index(index.document['name'])
+    logger.info("Dropped %d indexes for the bulk load.", len(indexes))
+    load_error = None
+    try:
+        yield
+    except BaseException as e:
+        load_error = e
+        raise
+    finally:
+        try:
+            collection.create_indexes(indexes)
+        except Exception as e:
+            logger.error("Failed to rebuild indexes %s: %s", [index.document for index in indexes], e)
+            raise e from load_error
+        logger.info("Rebuilt %d indexes.", len(indexes))
+
 def main():
     """
     The main function orchestrates the ETL process.
+
+    Records are streamed through parse, transform and load CHUNK_SIZE at a
+    time, so memory use is bounded by READ_BLOCK_SIZE and the chunk size rather
+    than by the input file.
+    Non-unique secondary indexes are dropped during the load and rebuilt at
+    the end; the first chunk is read beforehand, so an unreadable input file
+    leaves them untouched.
     """
     file_path = 'data/member-data.csv'
     logger.info("Starting ETL process...")
     try:
-        raw_data = read_data(file_path)
-        transformed_data = transform_data(raw_data)
-        load_data(transformed_data)
+        raw_chunks = read_data(file_path)
+        first_chunk = next(raw_chunks, None)
+        if first_chunk is not None:
+            transform_counts = {'transformed': 0, 'skipped': 0}
+            with suspended_indexes():
+                for raw_data in itertools.chain([first_chunk], raw_chunks):
+                    load_data(transform_data(raw_data, transform_counts))
+            _log_transform_summary(transform_counts)
         logger.info("ETL process completed successfully.")
     except Exception as e:
-        logger.error(f"ETL process failed: {e}")
+        logger.error("ETL process failed: %s", e)
 
 if __name__ == '__main__':
     main()
@@ -4,6 +4,9 @@ import unittest
 import os
 import sys
 import logging
+import tempfile
+import warnings
+import pandas as pd
 
 # Configure logging for the test module
 logging.basicConfig(
@@ -18,14 +21,49 @@ logger = logging.getLogger(__name__)
 # Add the parent directory to sys.path to import src.etl
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from src.etl import read_data, transform_data, load_data
-from unittest.mock import patch, MagicMock
+from src.etl import main, read_data, transform_data, load_data, suspended_indexes, BATCH_SIZE, LOG_SAMPLE_SIZE, _mongo_host
+from bson import ObjectId, SON
+from pymongo import WriteConcern
+from pymongo.errors import BulkWriteError, OperationFailure
+from unittest.mock import patch
 
 class TestETL(unittest.TestCase):
     """
     Test suite for the ETL process.
     """
 
+    def setUp(self):
+        """
+        Replace MongoClient with a mock and reset the shared client, so no test
+        opens a real connection or resolves a real host.
+        """
+        patch('src.etl._client', None).start()
+        self.mock_atexit = patch('src.etl.atexit').start()
+        self.mock_mongo_client = patch('src.etl.MongoClient').start()
+        patch.dict(os.environ, {'MONGO_HOST': 'localhost'}).start()
+        self.addCleanup(patch.stopall)
+        _mongo_host.cache_clear()
+        self.addCleanup(_mongo_host.cache_clear)
+
+        # client['etl_database'], then get_collection('employees', ...) or db['employees']
+        self.mock_db = self.mock_mongo_client.return_value.__getitem__.return_value
+        self.mock_collection = self.mock_db.get_collection.return_value
+        self.mock_db.__getitem__.return_value = self.mock_collection
+
+    def _read_lines(self, lines, **kwargs):
+        """
+        Writes `lines` to a temporary file and reads it back with read_data.
+
+        Returns:
+            List[pd.DataFrame]: The chunks yielded by read_data.
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_path = os.path.join(tmp_dir, 'members.csv')
+            with open(file_path, 'w', encoding='utf-8') as file:
+                file.write('\n'.join(lines) + '\n')
+
+            return list(read_data(file_path, **kwargs))
+
     def test_read_data(self):
         """
         Test the read_data function to ensure it reads and parses data correctly.
@@ -39,23 +77,93 @@ class TestETL(unittest.TestCase):
 
         logger.info(f"Attempting to read data from: {file_path}")
 
-        data = read_data(file_path)
+        chunks = list(read_data(file_path))
+        data = pd.concat(chunks)
 
-        # Check that data is a list
-        self.assertIsInstance(data, list, "Data should be a list")
+        # Check that each chunk is a DataFrame
+        for chunk in chunks:
+            self.assertIsInstance(chunk, pd.DataFrame, "Each chunk should be a DataFrame")
 
-        # Check that the list is not empty
-        self.assertGreater(len(data), 0, "Data list should not be empty")
+        # Check that data is a DataFrame
+        self.assertIsInstance(data, pd.DataFrame, "Data should be a DataFrame")
 
-        # Check that each item is a dictionary
-        self.assertIsInstance(data[0], dict, "Each data item should be a dictionary")
+        # Check that the DataFrame is not empty
+        self.assertGreater(len(data), 0, "Data should not be empty")
 
         # Check that expected keys are present
         expected_keys = {
             'FirstName', 'LastName', 'Company', 'BirthDate', 'Salary',
             'Address', 'Suburb', 'State', 'Post', 'Phone', 'Mobile', 'Email'
         }
-        self.assertEqual(set(data[0].keys()), expected_keys, "Data keys do not match expected keys")
+        self.assertEqual(set(data.columns), expected_keys, "Data columns do not match expected keys")
+
+    def test_read_data_chunksize(self):
+        """
+        Test that read_data yields chunks of at most `chunksize` records, skipping
+        malformed lines.
+        """
+        lines = [
+            'John|Doe|"Example Corp"|15011980|75000.00|123 Main St|Anytown|NSW|2000|0123456789|0987654321|john.doe@example.com',
+            'Too|Few|Fields',
+            'Jane|Roe|Acme|01021990|120000|1 High St|Sydney|VIC|3000|0211111111|0411111111|jane@example.com',
+            'Sam|Tan|Co|29022000|100000|4 St|Darwin|NT|0800|0800000001|0400000001|sam@example.com'
+        ]
+        chunks = self._read_lines(lines, chunksize=2)
+
+        self.assertEqual([len(chunk) for chunk in chunks], [1, 2], "Chunks are not split correctly")
+        self.assertIsInstance(chunks[0]['State'].dtype, pd.CategoricalDtype, "State should be categorical")
+        self.assertEqual(
+            pd.concat(chunks)['FirstName'].tolist(), ['John', 'Jane', 'Sam'],
+            "Malformed lines are not skipped"
+        )
+
+    def test_read_data_logs_malformed_lines(self):
+        """
+        Test that lines with too few or too many fields are counted, with at most
+        LOG_SAMPLE_SIZE of them logged as samples, and that no parser warnings
+        are emitted.
+        """
+        valid = 'John|Doe|Acme|15011980|75000|1 Main St|Anytown|NSW|2000|0123456789|0987654321|john@example.com'
+        short = 'Too|Few|Fields'
+        long = valid + '|extra'
+        lines = [valid, short, long, short, valid, long, long, short, valid]
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            with self.assertLogs('src.etl', level='INFO') as logs:
+                data = pd.concat(self._read_lines(lines, chunksize=3))
+
+        self.assertEqual(len(data), 3, "Only well-formed lines should be read")
+        samples = [message for message in logs.output if 'Skipping malformed line' in message]
+        self.assertEqual(len(samples), LOG_SAMPLE_SIZE, "Malformed line samples are not capped")
+        self.assertIn(repr(long), samples[1], "Lines with too many fields are not logged")
+        self.assertIn('INFO:src.etl:Skipped 6 malformed lines.', logs.output, "Malformed lines are not counted")
+
+    def test_read_data_empty_email(self):
+        """
+        Test that a well-formed record with an empty Email is read and transformed
+        rather than skipped as malformed.
+        """
+        line = 'John|Doe|Example Corp|15011980|75000.00|123 Main St|Anytown|NSW|2000|0123456789|0987654321|'
+        data = pd.concat(self._read_lines([line]))
+
+        self.assertEqual(data['Email'].tolist(), [''], "Empty Email should be read as ''")
+        transformed = transform_data(data)
+        self.assertEqual(len(transformed), 1, "Record with an empty Email should be transformed")
+        self.assertEqual(transformed[0]['Email'], '', "Email is not passed through")
+
+    def test_read_data_keeps_empty_and_na_values(self):
+        """
+        Test that empty fields and literal 'NA' values are kept verbatim, including
+        in the categorical State column.
+        """
+        line = 'NA|Doe|Example Corp|15011980|75000.00|123 Main St|Anytown||2000|0123456789|0987654321|NA'
+        data = pd.concat(self._read_lines([line]))
+
+        self.assertEqual(data['FirstName'].tolist(), ['NA'], "Literal 'NA' should be kept")
+        self.assertEqual(data['State'].tolist(), [''], "Empty State should be read as ''")
+        record = transform_data(data)[0]
+        self.assertEqual(record['Address']['State'], '', "Empty State is not passed through")
+        self.assertEqual(record['Email'], 'NA', "Literal 'NA' Email is not passed through")
 
     def test_transform_data(self):
         """
@@ -108,9 +216,70 @@ class TestETL(unittest.TestCase):
         }
         self.assertEqual(record['Address'], expected_address, "Address is not nested correctly")
 
-    @patch('src.etl.MongoClient')
+    def test_transform_data_skips_invalid_records(self):
+        """
+        Test that records with a malformed or impossible BirthDate, or a
+        non-numeric Salary, are skipped.
+        """
+        record = {
+            'FirstName': 'John', 'LastName': 'Doe', 'Company': '"Example Corp"',
+            'BirthDate': '1021990', 'Salary': '50000', 'Address': '123 Main St',
+            'Suburb': 'Anytown', 'State': 'NSW', 'Post': '2000',
+            'Phone': '0123456789', 'Mobile': '0987654321', 'Email': 'john.doe@example.com'
+        }
+        raw_data = [
+            record,
+            dict(record, BirthDate=''),
+            dict(record, BirthDate='1a021990'),
+            dict(record, BirthDate='31022000'),
+            # Arabic-Indic digits are not accepted as a date
+            dict(record, BirthDate='\u0663\u0661\u0660\u0661\u0661\u0669\u0669\u0660'),
+            dict(record, Salary='abc')
+        ]
+
+        transformed = transform_data(raw_data)
+
+        self.assertEqual(len(transformed), 1, "Only the valid record should be transformed")
+        self.assertIsInstance(transformed[0]['_id'], ObjectId, "_id should be pre-generated")
+        self.assertEqual(transformed[0]['Company'], 'Example Corp', "Company quotes are not stripped")
+        self.assertEqual(transformed[0]['BirthDate'], '01/02/1990', "BirthDate is not zero-padded correctly")
+        self.assertEqual(transformed[0]['Age'], 34, "Age is not calculated correctly")
+        self.assertEqual(transformed[0]['SalaryBucket'], 'B', "SalaryBucket is not assigned correctly")
+
+    def test_transform_data_shared_counts(self):
+        """
+        Test that chunks sharing `counts` accumulate the totals, share the
+        LOG_SAMPLE_SIZE sample budget and leave the summary to the caller.
+        """
+        record = {
+            'FirstName': 'John', 'LastName': 'Doe', 'Company': 'Example Corp',
+            'BirthDate': '15011980', 'Salary': '75000', 'Address': '123 Main St',
+            'Suburb': 'Anytown', 'State': 'NSW', 'Post': '2000',
+            'Phone': '0123456789', 'Mobile': '0987654321', 'Email': 'john.doe@example.com'
+        }
+        chunk = [record] + [dict(record, Salary='abc')] * 4
+        counts = {'transformed': 0, 'skipped': 0}
+
+        with self.assertLogs('src.etl', level='INFO') as logs:
+            transform_data(chunk, counts)
+            transform_data(chunk, counts)
+
+        self.assertEqual(counts, {'transformed': 2, 'skipped': 8}, "Counts are not accumulated")
+        self.assertEqual(len(logs.output), LOG_SAMPLE_SIZE, "Samples are not capped across chunks")
+        self.assertTrue(
+            all('Skipping record' in message for message in logs.output),
+            "The summary should be left to the caller"
+        )
+
+        with self.assertLogs('src.etl', level='INFO') as logs:
+            transform_data(chunk)
+        self.assertIn(
+            'INFO:src.etl:Skipped 4 records due to invalid BirthDate or Salary.', logs.output,
+            "The summary is not logged for a single call"
+        )
+
     @patch.dict(os.environ, {"DOCKER_ENV": "true"})
-    def test_load_data(self, mock_mongo_client):
+    def test_load_data(self):
         """
         Test the load_data function to ensure data is loaded into MongoDB correctly.
         """
@@ -133,23 +302,151 @@ class TestETL(unittest.TestCase):
             'Email': 'john.doe@example.com'
         }]
 
-        # Set up the mock MongoClient instance
-        mock_client_instance = MagicMock()
-        mock_mongo_client.return_value = mock_client_instance
+        # Act
+        load_data(transformed_data)
+
+        # Assert
+        self.mock_db.get_collection.assert_called_once_with('employees', write_concern=WriteConcern(w=0))
+        self.mock_collection.insert_many.assert_called_once_with(
+            transformed_data, ordered=False, bypass_document_validation=False
+        )
+        self.mock_mongo_client.return_value.close.assert_not_called()
+
+    def test_load_data_acknowledged(self):
+        """
+        Test that fast_insert=False loads with acknowledged writes and bypasses
+        document validation.
+        """
+        transformed_data = [{'FullName': 'John Doe'}]
+
+        load_data(transformed_data, fast_insert=False)
+
+        self.mock_db.get_collection.assert_called_once_with('employees', write_concern=WriteConcern(w=1))
+        self.mock_collection.insert_many.assert_called_once_with(
+            transformed_data, ordered=False, bypass_document_validation=True
+        )
+
+    def test_load_data_reuses_client(self):
+        """
+        Test that repeated load_data calls share a single MongoClient that is
+        closed at interpreter exit.
+        """
+        load_data([{'FullName': 'John Doe'}])
+        load_data([{'FullName': 'Jane Doe'}])
+
+        self.mock_mongo_client.assert_called_once()
+        self.mock_atexit.register.assert_called_once_with(self.mock_mongo_client.return_value.close)
+
+    @patch.dict(os.environ, {"MONGO_HOST": "db.example.com"})
+    def test_load_data_mongo_host(self):
+        """
+        Test that load_data connects to the host named by MONGO_HOST.
+        """
+        _mongo_host.cache_clear()
 
-        # Mock the database and collection
-        mock_db = MagicMock()
-        mock_client_instance.__getitem__.return_value = mock_db  # For client['etl_database']
+        load_data([{'FullName': 'John Doe'}])
 
-        mock_collection = MagicMock()
-        mock_db.__getitem__.return_value = mock_collection  # For db['employees']
+        self.assertEqual(self.mock_mongo_client.call_args.args[0], 'mongodb://db.example.com:27017/')
+
+    def test_load_data_batches(self):
+        """
+        Test that load_data splits the records into BATCH_SIZE batches and keeps
+        going when a batch reports write errors.
+        """
+        # Arrange
+        transformed_data = [{'FullName': f'Person {i}'} for i in range(BATCH_SIZE * 2 + 1)]
+
+        def insert_many(batch, **kwargs):
+            if batch[0]['FullName'] == 'Person 0':
+                raise BulkWriteError({'writeErrors': [{'index': 0, 'code': 11000}]})
+
+        self.mock_collection.insert_many.side_effect = insert_many
 
         # Act
-        load_data(transformed_data)
+        load_data(transformed_data, fast_insert=False)
+
+        # Assert
+        batches = [call.args[0] for call in self.mock_collection.insert_many.call_args_list]
+        self.assertEqual(sorted(len(batch) for batch in batches), [1, BATCH_SIZE, BATCH_SIZE])
+        inserted = sorted(sum(batches, []), key=lambda record: int(record['FullName'].split()[1]))
+        self.assertEqual(inserted, transformed_data, "All records should be inserted")
+
+    def test_suspended_indexes(self):
+        """
+        Test that suspended_indexes drops non-unique secondary indexes and
+        rebuilds them with their original options after the block, leaving
+        unique indexes in place.
+        """
+        # Arrange
+        self.mock_collection.index_information.return_value = {
+            '_id_': {'v': 2, 'key': [('_id', 1)]},
+            'Email_1': {'v': 2, 'key': [('Email', 1)], 'unique': True},
+            'Company_1': {'v': 2, 'key': [('Company', 1)], 'sparse': True}
+        }
+
+        # Act
+        with suspended_indexes():
+            self.mock_collection.drop_index.assert_called_once_with('Company_1')
+            self.mock_collection.create_indexes.assert_not_called()
 
         # Assert
-        mock_collection.insert_many.assert_called_once_with(transformed_data)
-        mock_client_instance.close.assert_called_once()
+        self.mock_collection.drop_indexes.assert_not_called()
+        indexes = self.mock_collection.create_indexes.call_args.args[0]
+        self.assertEqual(
+            [index.document for index in indexes],
+            [{'key': SON([('Company', 1)]), 'name': 'Company_1', 'sparse': True}],
+            "Secondary indexes are not rebuilt with their original options"
+        )
+
+    def test_suspended_indexes_rebuild_failure(self):
+        """
+        Test that a failed rebuild logs the index specifications and raises,
+        chained to the error that ended the load.
+        """
+        self.mock_collection.index_information.return_value = {
+            'Company_1': {'v': 2, 'key': [('Company', 1)]}
+        }
+        rebuild_error = OperationFailure('rebuild failed')
+        self.mock_collection.create_indexes.side_effect = rebuild_error
+        load_error = ValueError('load failed')
+
+        with self.assertLogs('src.etl', level='ERROR') as logs:
+            with self.assertRaises(OperationFailure) as context:
+                with suspended_indexes():
+                    raise load_error
+
+        self.assertIs(context.exception, rebuild_error, "The rebuild error is not raised")
+        self.assertIs(context.exception.__cause__, load_error, "The load error is not chained")
+        self.assertIn('Company_1', logs.output[0], "The index specifications are not logged")
+
+    @patch('src.etl.suspended_indexes')
+    @patch('src.etl.read_data')
+    def test_main_keeps_indexes_when_input_unreadable(self, mock_read_data, mock_suspended_indexes):
+        """
+        Test that main does not drop indexes when the input file cannot be read.
+        """
+        def unreadable(file_path):
+            raise FileNotFoundError(file_path)
+            yield
+
+        mock_read_data.side_effect = unreadable
+
+        with self.assertLogs('src.etl', level='ERROR'):
+            main()
+
+        mock_suspended_indexes.assert_not_called()
+
+    def test_suspended_indexes_without_secondary_indexes(self):
+        """
+        Test that suspended_indexes leaves a collection with only the _id index alone.
+        """
+        self.mock_collection.index_information.return_value = {'_id_': {'v': 2, 'key': [('_id', 1)]}}
+
+        with suspended_indexes():
+            pass
+
+        self.mock_collection.drop_indexes.assert_not_called()
+        self.mock_collection.create_indexes.assert_not_called()
 
 if __name__ == '__main__':
     unittest.main()